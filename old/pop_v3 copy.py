@@ -9,9 +9,17 @@ import random
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 
+# Texture dot positions, generated once with a fixed seed so the pattern is stable
+_texture_rng = random.Random(0)
+_TEXTURE_POINTS = tuple((_texture_rng.randint(0, 520), _texture_rng.randint(0, 720)) for _ in range(100))
+
 class NOXPopup:
     def __init__(self):
         self.root = tk.Tk()
+        self._blend_cache: Dict[tuple, str] = {}
+        # Created during UI setup; None until then
+        self.gradient_colors: Optional[List[str]] = None
+        self.status_indicator: Optional[tk.Label] = None
         self.setup_window()
         self.setup_ui()
         self.load_api_key()
@@ -237,12 +245,12 @@ class NOXPopup:
         except FileNotFoundError:
             self.api_key = None
             self.add_to_chat("⚠ Please create ../api_key.txt with your OpenAI API key", "debug_message")
-            if hasattr(self, 'status_indicator'):
+            if self.status_indicator is not None:
                 self.status_indicator.config(fg=self.colors['error'])
         except Exception as e:
             self.api_key = None
             self.add_to_chat(f"✗ Error loading API key: {e}", "debug_message")
-            if hasattr(self, 'status_indicator'):
+            if self.status_indicator is not None:
                 self.status_indicator.config(fg=self.colors['error'])
             
     def add_welcome_message(self):
@@ -321,6 +329,7 @@ I'll automatically save tasks to a local JSON file that you can inspect. Try say
         """Pre-compute gradient colors for better performance"""
         height = 720
         colors = []
+        rgb = []
         
         # Gradient endpoints
         start_r, start_g, start_b = 0x4c, 0x1d, 0x95  # Deep violet
@@ -334,42 +343,31 @@ I'll automatically save tasks to a local JSON file that you can inspect. Try say
             g = int(start_g + (end_g - start_g) * ratio)
             b = int(start_b + (end_b - start_b) * ratio)
             
-            colors.append(f"#{r:02x}{g:02x}{b:02x}")
-            
+            rgb.append((r, g, b))
+            colors.append("#%02x%02x%02x" % (r, g, b))
+        
+        # Keep the parsed triples so blending doesn't re-parse hex strings
+        self._gradient_rgb = rgb
         return colors
         
     def draw_optimized_gradient(self):
-        """Draw gradient using optimized rectangle method"""
+        """Draw gradient as a single image instead of per-chunk rectangles"""
         self.gradient_canvas.delete("all")
         
-        # Draw gradient in chunks for better performance
-        chunk_size = 8
+        # Put the whole palette into a 1px-wide column in one Tk call, then
+        # stretch it horizontally so the canvas holds one image item
+        column = tk.PhotoImage(width=1, height=len(self.gradient_colors))
+        column.put(" ".join("{%s}" % color for color in self.gradient_colors))
+        self._gradient_image = column.zoom(520, 1)  # Keep a reference so Tk doesn't drop it
         
-        for i in range(0, 720, chunk_size):
-            if i < len(self.gradient_colors):
-                color = self.gradient_colors[i]
-                
-                # Draw rectangle chunk instead of individual lines
-                self.gradient_canvas.create_rectangle(
-                    0, i, 520, min(i + chunk_size, 720),
-                    fill=color,
-                    outline=color
-                )
+        self.gradient_canvas.create_image(0, 0, anchor=tk.NW, image=self._gradient_image)
         
         # Add subtle texture overlay
         self._add_optimized_texture()
         
     def _add_optimized_texture(self):
         """Add performance-optimized texture overlay"""
-        # Pre-generate texture points
-        texture_points = []
-        for _ in range(100):
-            x = random.randint(0, 520)
-            y = random.randint(0, 720)
-            texture_points.append((x, y))
-        
-        # Draw texture in batch
-        for x, y in texture_points:
+        for x, y in _TEXTURE_POINTS:
             self.gradient_canvas.create_oval(
                 x, y, x+2, y+2,
                 fill="#ffffff",
@@ -383,27 +381,26 @@ I'll automatically save tasks to a local JSON file that you can inspect. Try say
         alpha = max(0.0, min(1.0, alpha))
         gradient_pos = max(0.0, min(1.0, gradient_pos))
         
+        # UI setup asks for the same few blends repeatedly
+        cache_key = (bg_hex, round(alpha, 3), round(gradient_pos, 3))
+        cached = self._blend_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         # Get gradient color at position
-        if hasattr(self, 'gradient_colors') and self.gradient_colors:
-            gradient_index = int(gradient_pos * (len(self.gradient_colors) - 1))
-            gradient_color = self.gradient_colors[gradient_index]
+        if self.gradient_colors:
+            gradient_index = int(gradient_pos * (len(self._gradient_rgb) - 1))
+            grad_r, grad_g, grad_b = self._gradient_rgb[gradient_index]
         else:
             # Fallback if gradient not ready
-            gradient_color = self.colors['gradient_start']
+            start_hex = self.colors['gradient_start'].lstrip('#')
+            grad_r, grad_g, grad_b = bytes.fromhex(start_hex)
         
         # Parse colors safely
         try:
-            # Gradient color
-            grad_hex = gradient_color.lstrip('#')
-            grad_r = int(grad_hex[0:2], 16)
-            grad_g = int(grad_hex[2:4], 16) 
-            grad_b = int(grad_hex[4:6], 16)
-            
             # Background color
             bg_hex = bg_hex.lstrip('#')
-            bg_r = int(bg_hex[0:2], 16)
-            bg_g = int(bg_hex[2:4], 16)
-            bg_b = int(bg_hex[4:6], 16)
+            bg_r, bg_g, bg_b = bytes.fromhex(bg_hex[:6])
             
             # Correct alpha blending: result = bg * alpha + gradient * (1 - alpha)
             final_r = int(bg_r * alpha + grad_r * (1.0 - alpha))
@@ -415,12 +412,15 @@ I'll automatically save tasks to a local JSON file that you can inspect. Try say
             final_g = max(0, min(255, final_g))
             final_b = max(0, min(255, final_b))
             
-            return f"#{final_r:02x}{final_g:02x}{final_b:02x}"
+            blended = "#%02x%02x%02x" % (final_r, final_g, final_b)
             
         except (ValueError, IndexError):
             # Fallback to solid color on parse error
             return bg_hex
         
+        self._blend_cache[cache_key] = blended
+        return blended
+        
     def center_window(self):
         """Center the window on screen"""
         self.root.update_idletasks()
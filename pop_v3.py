@@ -1,236 +1,879 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+from tkinter import ttk, scrolledtext
 import openai
+import httpx
 import threading
+import asyncio
+import atexit
+import time
 import os
 import json
 import uuid
+import hashlib
+import importlib.util
+import math
+import gc
+import sqlite3
+from collections import deque
+from contextlib import contextmanager
+from types import SimpleNamespace
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    import orjson  # Optional: faster JSON on the tool-call path
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    json_loads = orjson.loads  # orjson.JSONDecodeError subclasses json.JSONDecodeError
+
+    def json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+else:
+    json_loads = json.loads
+    json_dumps = json.dumps
+
+try:
+    import tiktoken  # Optional: local prompt-token counts for an instant cost estimate
+except ImportError:
+    tiktoken = None
+
+@contextmanager
+def _gc_paused():
+    """Suspend the cyclic GC while bulk-decoding records that are never cyclic"""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+# Developer switches: NOX_RECORD=1 records each turn (see TurnRecorder) and
+# NOX_REPLAY=1 answers only from those recordings, so iterating costs nothing
+RECORD_MODE = os.environ.get("NOX_RECORD") == "1"
+REPLAY_MODE = os.environ.get("NOX_REPLAY") == "1"
+
+# httpx only speaks HTTP/2 when the optional h2 package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+PRIORITY_ICON = {"high": "🔴", "medium": "🟡", "low": "🟢"}
+
+def _strip(text: str) -> str:
+    """str.strip() that skips the copy when there is no edge whitespace"""
+    if text and (text[0].isspace() or text[-1].isspace()):
+        return text.strip()
+    return text
+
+NOX_SYSTEM_PREAMBLE = """You are NOX, a helpful personal assistant. You can manage tasks for the user.
+
+You have access to task management functions. Use them when:
+- User asks to add a task or mentions something they need to do
+- User asks about their current tasks
+- User wants to mark something as complete
+- User asks you to break down a complex task into smaller ones
+
+Keep responses concise and helpful. When you use functions, explain what you did."""
+
+HELP_TEXT = """Just type to chat, or ask me to add, list, or complete tasks.
+
+These commands are answered locally, without contacting the API:
+• help - show this message
+• tasks - list your current tasks
+• cost - show what this session has cost so far
+• clear - clear the chat history
+• batch - submit requests queued with "Queue for batch" to the Batch API"""
+
+# Functions GPT can call for task management (passed as-is in the tools payload)
+_FUNCTION_DEFS = [
+    {
+        "name": "add_task",
+        "description": "Add a new task to the user's task list",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "title": {
+                    "type": "string",
+                    "description": "The main title/name of the task"
+                },
+                "description": {
+                    "type": "string",
+                    "description": "Detailed description of what needs to be done"
+                },
+                "timeline": {
+                    "type": "string",
+                    "description": "When this should be done (e.g., 'today', 'next week', '2024-01-15')"
+                },
+                "priority": {
+                    "type": "string",
+                    "enum": ["low", "medium", "high"],
+                    "description": "Priority level of the task"
+                },
+                "notes": {
+                    "type": "string",
+                    "description": "Additional notes or context about the task"
+                }
+            },
+            "required": ["title"]
+        }
+    },
+    {
+        "name": "get_tasks",
+        "description": "Get the current list of tasks",
+        "parameters": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    },
+    {
+        "name": "complete_task",
+        "description": "Mark a task as completed. Can accept task ID, task title (partial match), or task number from the list.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "task_identifier": {
+                    "type": "string",
+                    "description": "The task to complete. Can be: UUID, partial title match, or number from active task list (e.g., '1', '2')"
+                }
+            },
+            "required": ["task_identifier"]
+        }
+    }
+]
+
+_JSON_TYPES = {"string": str, "integer": int, "number": (int, float), "boolean": bool, "object": dict, "array": list}
+
+def _compile_arg_validator(parameters: Dict[str, Any], aliases: Optional[Dict[str, str]] = None):
+    """Build a parse-and-validate function for one function's JSON schema.
+    `aliases` maps alternate argument names models send onto schema names."""
+    aliases = aliases or {}
+    properties = parameters.get("properties", {})
+    required = tuple(parameters.get("required", ()))
+    checks = [
+        (name, _JSON_TYPES.get(spec.get("type"), object), frozenset(spec["enum"]) if "enum" in spec else None)
+        for name, spec in properties.items()
+    ]
+    
+    def validate(raw: str) -> Dict[str, Any]:
+        args = json_loads(raw or "{}")
+        if not isinstance(args, dict):
+            raise ValueError("arguments must be a JSON object")
+        for alias, name in aliases.items():
+            if alias in args and name not in args:
+                args[name] = args[alias]
+        missing = [name for name in required if name not in args]
+        if missing:
+            raise ValueError(f"missing required argument(s): {', '.join(missing)}")
+        validated = {}
+        for name, expected_type, allowed in checks:
+            if name not in args:
+                continue
+            value = args[name]
+            if not isinstance(value, expected_type) or (expected_type is not bool and isinstance(value, bool)):
+                raise ValueError(f"'{name}' has the wrong type")
+            if allowed is not None and value not in allowed:
+                # Models vary in casing ("High"); normalize first
+                if isinstance(value, str):
+                    value = value.strip().lower()
+                if value not in allowed:
+                    continue  # Drop it so the handler's default applies rather than losing the call
+            validated[name] = value
+        return validated  # Unknown keys are dropped
+    
+    return validate
+
+# Argument names models have been seen to send instead of the schema's
+_ARG_ALIASES = {"complete_task": {"task_id": "task_identifier"}}
+
+# Validators are built once from the schemas rather than per tool call
+_ARG_VALIDATORS = {
+    func["name"]: _compile_arg_validator(func["parameters"], _ARG_ALIASES.get(func["name"]))
+    for func in _FUNCTION_DEFS
+}
+
+# Usage reported for replies served from the response cache: nothing was billed
+_CACHED_USAGE = SimpleNamespace(prompt_tokens=0, completion_tokens=0)
+
+class LLMCache:
+    """Exact-match cache of chat completions in a SQLite file, shared by every
+    NOX process, with a TTL and least-recently-used eviction"""
+    
+    def __init__(self, path: str = os.path.join("cache", "responses.sqlite3"), ttl: float = 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None  # Opened on first use
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """Hash everything that shapes the reply except max_tokens (checked on lookup)"""
+        key_fields = {
+            "model": request.get("model"),
+            "messages": request.get("messages"),
+            "temperature": request.get("temperature"),
+            "tools": request.get("tools")
+        }
+        # Stdlib json on purpose: keys must not change with whether orjson is installed
+        return hashlib.sha256(json.dumps(key_fields, sort_keys=True).encode("utf-8")).hexdigest()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Used from the UI thread and the GPT loop thread, serialized by _lock
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, entry TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+        return self._conn
+    
+    def get(self, key: str, max_tokens: int) -> Optional[Dict[str, Any]]:
+        """Return the cached entry if it is valid for a request with this token cap"""
+        now = time.time()
+        entry = None
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT entry FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                    conn.commit()
+                    entry = json_loads(row[0])
+            except (sqlite3.Error, json.JSONDecodeError) as e:
+                print(f"Error reading response cache: {e}")
+        
+        # A reply cut off by its own cap is only reusable under the same cap
+        if entry is not None and (
+            entry["completion_tokens"] > max_tokens
+            or (entry["finish_reason"] == "length" and entry["max_tokens"] != max_tokens)
+        ):
+            entry = None
+        
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+    
+    def put(self, key: str, entry: Dict[str, Any]):
+        """Store an entry, evicting expired and least recently used rows"""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, json_dumps(entry), now + self.ttl, now)
+                )
+                conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                    "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing response cache: {e}")
+    
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM responses")
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error clearing response cache: {e}")
+            self.hits = self.misses = 0
+
+class TurnRecorder:
+    """Whole conversation turns (reply, function results, token counts) keyed on
+    the prompt, recorded under NOX_RECORD=1 and served back under NOX_REPLAY=1.
+    Kept apart from LLMCache so recordings don't expire with its TTL."""
+    
+    def __init__(self, path: str = os.path.join("cache", "turns.sqlite3"), max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None  # Opened on first use
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(system_prompt: str, tasks: str, message: str, model: str, temperature: float, max_tokens: int) -> str:
+        """Hash everything that shapes a turn"""
+        key_fields = [system_prompt, tasks, message, model, temperature, max_tokens]
+        return hashlib.sha256(json.dumps(key_fields).encode("utf-8")).hexdigest()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Used from the GPT loop thread only, but serialized by _lock all the same
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS turns ("
+                "key TEXT PRIMARY KEY, entry TEXT NOT NULL, recorded_at REAL NOT NULL)"
+            )
+        return self._conn
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the recorded turn for this key, if any"""
+        with self._lock:
+            try:
+                row = self._connect().execute("SELECT entry FROM turns WHERE key = ?", (key,)).fetchone()
+                return json_loads(row[0]) if row is not None else None
+            except (sqlite3.Error, json.JSONDecodeError) as e:
+                print(f"Error reading recorded turns: {e}")
+                return None
+    
+    def put(self, key: str, entry: Dict[str, Any]):
+        """Record a turn, keeping only the newest max_entries"""
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("INSERT OR REPLACE INTO turns VALUES (?, ?, ?)", (key, json_dumps(entry), time.time()))
+                conn.execute(
+                    "DELETE FROM turns WHERE key IN (SELECT key FROM turns "
+                    "ORDER BY recorded_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error recording turn: {e}")
+    
+    def clear(self):
+        """Drop every recorded turn"""
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM turns")
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error clearing recorded turns: {e}")
+
+class SemanticCache:
+    """Near-duplicate prompt cache: replies indexed by the normalized embedding
+    of the user message, persisted as JSONL"""
+    
+    def __init__(self, path: str = os.path.join("cache", "semantic.jsonl"), threshold: float = 0.92, max_entries: int = 500):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries: Optional[List[Dict[str, Any]]] = None  # Loaded on first use
+        self._file_lines = 0  # Entries in the file, including ones trimmed from memory
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _normalize(vector: List[float]) -> List[float]:
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+    
+    def _load(self) -> List[Dict[str, Any]]:
+        """Read persisted entries, keeping the newest max_entries"""
+        if self._entries is None:
+            entries = []
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f, _gc_paused():
+                    for line in f:
+                        try:
+                            entries.append(json_loads(line))
+                        except json.JSONDecodeError:
+                            continue
+            except OSError:
+                pass
+            self._file_lines = len(entries)
+            self._entries = entries[-self.max_entries:]
+        return self._entries
+    
+    def lookup(self, embedding: List[float], context: str) -> Optional[str]:
+        """Return the cached reply most similar to `embedding` within the same
+        context, if it clears the similarity threshold"""
+        query = self._normalize(embedding)
+        best_score, best_reply = self.threshold, None
+        with self._lock:
+            for entry in self._load():
+                if entry["context"] != context:
+                    continue
+                # Both sides are unit vectors, so the dot product is the cosine
+                score = sum(a * b for a, b in zip(query, entry["embedding"]))
+                if score >= best_score:
+                    best_score, best_reply = score, entry["reply"]
+        return best_reply
+    
+    def add(self, embedding: List[float], context: str, reply: str):
+        """Remember a reply and append it to the sidecar file"""
+        entry = {"embedding": self._normalize(embedding), "context": context, "reply": reply}
+        with self._lock:
+            entries = self._load()
+            entries.append(entry)
+            del entries[:-self.max_entries]
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                if self._file_lines + 1 > 2 * self.max_entries:
+                    # Rewrite with only the kept entries; the 2x slack keeps rewrites rare
+                    tmp_path = self.path + ".tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        f.write("".join(json_dumps(e) + "\n" for e in entries))
+                    os.replace(tmp_path, self.path)
+                    self._file_lines = len(entries)
+                else:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(json_dumps(entry) + "\n")
+                    self._file_lines += 1
+            except OSError as e:
+                print(f"Error writing semantic cache: {e}")
+    
+    def clear(self):
+        """Drop every cached reply"""
+        with self._lock:
+            self._entries = []
+            self._file_lines = 0
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error clearing semantic cache: {e}")
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute; waits before a request
+    would exceed either limit instead of waiting out a 429 afterwards"""
+    
+    def __init__(self, rpm: int = 500, tpm: int = 200_000):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)  # Both buckets start full
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+    
+    async def acquire(self, estimated_tokens: int):
+        """Wait until one request and estimated_tokens fit, then take them.
+        Only called from the GPT event loop, so no lock is needed."""
+        estimated_tokens = min(estimated_tokens, self.tpm)  # Never wait forever
+        while True:
+            self._refill()
+            if self._requests >= 1 and self._tokens >= estimated_tokens:
+                self._requests -= 1
+                self._tokens -= estimated_tokens
+                return
+            await asyncio.sleep(max(
+                (1 - self._requests) * 60 / self.rpm,
+                (estimated_tokens - self._tokens) * 60 / self.tpm
+            ))
 
 class NOXPopup:
+    # Prices in micro-cents (1e-6 cent) per token, so cost stays integer math.
+    # GPT-4o-mini: $0.15 / 1M input, $0.60 / 1M output; text-embedding-3-small: $0.02 / 1M
+    INPUT_UCENTS_PER_TOKEN = 15
+    OUTPUT_UCENTS_PER_TOKEN = 60
+    EMBEDDING_UCENTS_PER_TOKEN = 2
+    # Queued chat text is flushed at most this often (~30 FPS)
+    CHAT_FLUSH_MS = 33
+    MAX_BATCH_MESSAGES = 8  # Larger bursts are split across requests
+    MAX_CHAT_LINES = 2000  # Oldest chat lines are dropped past this
+    
     def __init__(self):
         self.root = tk.Tk()
+        # Chat text is queued and inserted once per tick (see add_to_chat)
+        self._chat_queue: deque = deque()
+        self._chat_flush_scheduled = False
+        # All GPT requests run as coroutines on one background event loop
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
         self.setup_window()
         self.setup_ui()
         self.load_api_key()
-        self.total_cost = 0.00
-        self.tasks_file = "tasks.json"
+        self.total_ucents = 0
+        self._shown_ucents = 0  # Value currently on the cost label
+        self._enc = None
+        self._enc_loaded = False  # Loaded by the first request, off the UI thread
+        # Tasks live in an append-only JSONL log; tasks.json is the legacy format
+        self.tasks_file = "tasks.log.jsonl"
+        self.legacy_tasks_file = "tasks.json"
+        self._tasks_cache: Optional[List[Dict[str, Any]]] = None
+        self._tasks_by_id: Dict[str, Dict[str, Any]] = {}
+        self._title_lower_by_id: Dict[str, str] = {}  # Precomputed for title matching
+        self._tasks_lock = threading.Lock()
+        self._tasks_version = 0
+        self._summary_cache: Optional[Tuple[int, str]] = None
+        self._stream_started = False
+        self._thinking_shown = False
+        # User messages waiting for the coalescing window (see send_message)
+        self._pending: List[str] = []
+        self._pending_after_id = None
+        self._request_in_flight = False
+        # Request pieces that never change between turns
+        self._tools = [{"type": "function", "function": func} for func in self.get_function_definitions()]
+        self._system_msg = {"role": "system", "content": NOX_SYSTEM_PREAMBLE}
+        self._llm_cache = LLMCache()
+        self._turn_recorder = TurnRecorder()
+        self._limiter = RateLimiter(rpm=500, tpm=200_000)
+        # Requests queued for the half-price Batch API (see _queue_batch_request)
+        self.batch_file = "nox_batch.jsonl"
+        self._semantic_cache = SemanticCache()
+        # Messages answered locally instead of being sent to GPT (see send_message)
+        self._local_commands = {
+            "help": self._cmd_help,
+            "tasks": self._cmd_tasks,
+            "cost": self._cmd_cost,
+            "clear": self._cmd_clear,
+            "batch": self._cmd_batch
+        }
+        # Function-call name -> handler; new tools only need an entry here
+        self._fn_table = {
+            "add_task": self._fn_add_task,
+            "get_tasks": self._fn_get_tasks,
+            "complete_task": self._fn_complete_task
+        }
+        self._ts_cache = ""
+        self._ts_cache_at = float("-inf")
+        # Appends go straight to the log; full rewrites (compaction) are
+        # coalesced by a background writer (see save_tasks)
+        self._tasks_log = None
+        self._tasks_log_lines = 0
+        self._tasks_dirty = threading.Event()
+        self._tasks_write_lock = threading.Lock()
+        threading.Thread(target=self._tasks_writer_loop, daemon=True).start()
+        atexit.register(self._close_tasks_log)
         self.initialize_tasks_file()
+        if self.client is not None:
+            self._resume_batches()
         
     def initialize_tasks_file(self):
-        """Initialize tasks JSON file if it doesn't exist"""
-        if not os.path.exists(self.tasks_file):
-            self.save_tasks([])
+        """Initialize the tasks log if it doesn't exist, importing legacy tasks.json"""
+        if os.path.exists(self.tasks_file):
+            return
+        
+        tasks = []
+        if os.path.exists(self.legacy_tasks_file):
+            try:
+                with open(self.legacy_tasks_file, 'r', encoding='utf-8') as f:
+                    tasks = json_loads(f.read())
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error importing {self.legacy_tasks_file}: {e}")
+        self.save_tasks(tasks)
+        self._flush_tasks()
             
     def load_tasks(self) -> List[Dict[str, Any]]:
-        """Load tasks from JSON file"""
-        try:
-            with open(self.tasks_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            print(f"Error loading tasks: {e}")
-            return []
+        """Load tasks, replaying the log file only on first use"""
+        if self._tasks_cache is not None:
+            return list(self._tasks_cache)
+        
+        # Lock so the GPT worker thread and the UI thread don't both hit disk
+        with self._tasks_lock:
+            if self._tasks_cache is None:
+                try:
+                    self._tasks_cache = self._replay_tasks_log()
+                except OSError as e:
+                    print(f"Error loading tasks: {e}")
+                    self._tasks_cache = []
+                self._tasks_by_id = {task["id"]: task for task in self._tasks_cache}
+                self._title_lower_by_id = {task["id"]: task["title"].lower() for task in self._tasks_cache}
+            tasks = list(self._tasks_cache)
+        
+        self._compact_tasks_if_needed()
+        return tasks
+    
+    def _replay_tasks_log(self) -> List[Dict[str, Any]]:
+        """Rebuild the task list from the add/complete records in the log"""
+        tasks_by_id: Dict[str, Dict[str, Any]] = {}
+        lines = 0
+        with open(self.tasks_file, 'r', encoding='utf-8') as f, _gc_paused():
+            for line in f:
+                if not line.strip():
+                    continue
+                lines += 1
+                try:
+                    record = json_loads(line)
+                except json.JSONDecodeError as e:
+                    # A torn final line from a crash shouldn't lose the rest
+                    print(f"Skipping bad task record: {e}")
+                    continue
+                
+                if record.get("op") == "add":
+                    tasks_by_id[record["task"]["id"]] = record["task"]
+                elif record.get("op") == "complete":
+                    task = tasks_by_id.get(record["id"])
+                    if task:
+                        task["completed"] = True
+                        task["completed_at"] = record["completed_at"]
+        
+        self._tasks_log_lines = lines
+        return list(tasks_by_id.values())
+    
+    def _append_task_record(self, record: Dict[str, Any]) -> bool:
+        """Append one change record to the tasks log"""
+        with self._tasks_write_lock:
+            try:
+                if self._tasks_log is None:
+                    self._tasks_log = open(self.tasks_file, 'a', encoding='utf-8')
+                self._tasks_log.write(json_dumps(record) + "\n")
+                self._tasks_log.flush()  # No fsync on the hot path; see _close_tasks_log
+                self._tasks_log_lines += 1
+            except Exception as e:
+                print(f"Error saving tasks: {e}")
+                return False
+        
+        self._compact_tasks_if_needed()
+        return True
+    
+    def _compact_tasks_if_needed(self):
+        """Schedule a rewrite once the log holds more than twice as many records as tasks"""
+        if self._tasks_log_lines > 2 * len(self._tasks_cache or []):
+            self._tasks_dirty.set()
     
     def save_tasks(self, tasks: List[Dict[str, Any]]) -> bool:
-        """Save tasks to JSON file"""
-        try:
-            with open(self.tasks_file, 'w', encoding='utf-8') as f:
-                json.dump(tasks, f, indent=2, ensure_ascii=False)
-            return True
-        except Exception as e:
-            print(f"Error saving tasks: {e}")
-            return False
+        """Replace the in-memory task list and schedule a full rewrite of the log"""
+        with self._tasks_lock:
+            self._tasks_cache = list(tasks)
+            self._tasks_by_id = {task["id"]: task for task in tasks}
+            self._title_lower_by_id = {task["id"]: task["title"].lower() for task in tasks}
+            self._tasks_version += 1
+        self._tasks_dirty.set()
+        return True
+    
+    def _tasks_writer_loop(self):
+        """Background writer: a burst of saves becomes a single disk write"""
+        while True:
+            self._tasks_dirty.wait()
+            time.sleep(0.1)  # Let the rest of the burst land first
+            self._flush_tasks()
+    
+    def _flush_tasks(self) -> bool:
+        """Rewrite the log as one add record per task, atomically"""
+        with self._tasks_write_lock:
+            if not self._tasks_dirty.is_set():
+                return True
+            self._tasks_dirty.clear()
+            with self._tasks_lock:
+                # Copy the records too; callers mutate task dicts in place
+                tasks = [dict(task) for task in self._tasks_cache or []]
+            
+            tmp_file = self.tasks_file + ".tmp"
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    f.write("".join(json_dumps({"op": "add", "task": task}) + "\n" for task in tasks))
+                if self._tasks_log is not None:
+                    self._tasks_log.close()
+                    self._tasks_log = None  # Reopened on the next append
+                os.replace(tmp_file, self.tasks_file)
+                self._tasks_log_lines = len(tasks)
+                return True
+            except Exception as e:
+                print(f"Error saving tasks: {e}")
+                return False
+    
+    def _close_tasks_log(self):
+        """Write any pending rewrite and fsync the log"""
+        self._flush_tasks()
+        with self._tasks_write_lock:
+            if self._tasks_log is not None:
+                try:
+                    self._tasks_log.flush()
+                    os.fsync(self._tasks_log.fileno())
+                    self._tasks_log.close()
+                except OSError as e:
+                    print(f"Error closing tasks log: {e}")
+                self._tasks_log = None
+    
+    def _record_task_change(self, record: Dict[str, Any]) -> bool:
+        """Invalidate derived data for an in-place task change and log it"""
+        with self._tasks_lock:
+            self._tasks_version += 1
+        return self._append_task_record(record)
+    
+    def _now_iso(self) -> str:
+        """Current time as an ISO string to the second, formatted once per second"""
+        now = int(time.time())
+        if now != self._ts_cache_at:
+            self._ts_cache = datetime.fromtimestamp(now).isoformat(timespec="seconds")
+            self._ts_cache_at = now
+        return self._ts_cache
     
     def add_task_to_json(self, title: str, description: str = "", timeline: str = "", priority: str = "medium", notes: str = "") -> Dict[str, Any]:
-        """Add a new task to the JSON file"""
+        """Add a new task to the tasks log"""
         task = {
             "id": str(uuid.uuid4()),
-            "title": title.strip(),
-            "description": description.strip(),
-            "timeline": timeline.strip(),
-            "priority": priority.lower(),
-            "notes": notes.strip(),
+            "title": _strip(title),
+            "description": _strip(description),
+            "timeline": _strip(timeline),
+            "priority": priority if priority in PRIORITY_ICON else _strip(priority).lower(),
+            "notes": _strip(notes),
             "completed": False,
-            "created_at": datetime.now().isoformat(),
+            "created_at": self._now_iso(),
             "completed_at": None
         }
+        if task["priority"] not in PRIORITY_ICON:
+            task["priority"] = "medium"
         
-        tasks = self.load_tasks()
-        tasks.append(task)
+        self.load_tasks()  # Make sure the cache is populated
+        with self._tasks_lock:
+            self._tasks_cache.append(task)
+            self._tasks_by_id[task["id"]] = task
+            self._title_lower_by_id[task["id"]] = task["title"].lower()
         
-        if self.save_tasks(tasks):
+        if self._record_task_change({"op": "add", "task": task}):
             return task
         else:
             raise Exception("Failed to save task to file")
     
-    def complete_task_in_json(self, task_identifier: str) -> bool:
-        """Mark a task as completed in the JSON file. Accepts UUID, title, or index."""
+    def complete_task_in_json(self, task_identifier: str) -> Optional[Dict[str, Any]]:
+        """Mark a task as completed in the tasks log. Accepts UUID, title, or index.
+        Returns the completed task, or None if no active task matched."""
         tasks = self.load_tasks()
-        task_to_complete = None
+        identifier_lower = task_identifier.lower()
+        try:
+            wanted_index = int(task_identifier)  # 1-based position among active tasks
+        except ValueError:
+            wanted_index = None
         
-        # Try to find task by UUID first
-        for task in tasks:
-            if task["id"] == task_identifier and not task["completed"]:
-                task_to_complete = task
-                break
+        # A UUID match wins outright and is a single dict lookup
+        task_to_complete = self._tasks_by_id.get(task_identifier)
+        if task_to_complete is not None and task_to_complete["completed"]:
+            task_to_complete = None
         
-        # If not found by UUID, try by title (partial match, case insensitive)
-        if not task_to_complete:
+        if task_to_complete is None:
+            # Single pass over active tasks: title (partial match, case
+            # insensitive) first, then index
+            title_match = None
+            index_match = None
+            active_index = 0
+            titles_lower = self._title_lower_by_id
             for task in tasks:
-                if not task["completed"] and task_identifier.lower() in task["title"].lower():
-                    task_to_complete = task
-                    break
-        
-        # If still not found, try by index (1-based)
-        if not task_to_complete:
-            try:
-                index = int(task_identifier) - 1  # Convert to 0-based
-                active_tasks = [t for t in tasks if not t["completed"]]
-                if 0 <= index < len(active_tasks):
-                    task_to_complete = active_tasks[index]
-            except ValueError:
-                pass
+                if task["completed"]:
+                    continue
+                active_index += 1
+                if title_match is None:
+                    title_lower = titles_lower.get(task["id"])
+                    if title_lower is None:
+                        title_lower = titles_lower[task["id"]] = task["title"].lower()
+                    if identifier_lower in title_lower:
+                        title_match = task
+                        break
+                if active_index == wanted_index:
+                    index_match = task
+            task_to_complete = title_match or index_match
         
         if task_to_complete:
             task_to_complete["completed"] = True
-            task_to_complete["completed_at"] = datetime.now().isoformat()
-            return self.save_tasks(tasks)
+            task_to_complete["completed_at"] = self._now_iso()
+            if self._record_task_change({
+                "op": "complete",
+                "id": task_to_complete["id"],
+                "completed_at": task_to_complete["completed_at"]
+            }):
+                return task_to_complete
         
-        return False
+        return None
     
     def get_tasks_summary(self) -> str:
         """Get a formatted summary of current tasks with IDs for GPT"""
-        tasks = self.load_tasks()
+        # Reuse the last summary until the task list changes
+        if self._summary_cache and self._summary_cache[0] == self._tasks_version:
+            return self._summary_cache[1]
         
+        version = self._tasks_version
+        summary = self._build_tasks_summary(self.load_tasks())
+        self._summary_cache = (version, summary)
+        return summary
+    
+    def _build_tasks_summary(self, tasks: List[Dict[str, Any]]) -> str:
+        """Format the task list for the system prompt"""
         if not tasks:
             return "No tasks found."
         
         active_tasks = [t for t in tasks if not t["completed"]]
         completed_tasks = [t for t in tasks if t["completed"]]
         
-        summary = f"Active Tasks ({len(active_tasks)}):\n"
+        parts = [f"Active Tasks ({len(active_tasks)}):"]
+        icon_get = PRIORITY_ICON.get
         for i, task in enumerate(active_tasks, 1):
-            priority_indicator = "🔴" if task["priority"] == "high" else "🟡" if task["priority"] == "medium" else "🟢"
-            timeline_str = f" | Due: {task['timeline']}" if task["timeline"] else ""
+            t_get = task.get
+            priority_indicator = icon_get(t_get("priority"), "🟢")
+            timeline = t_get("timeline")
+            timeline_str = f" | Due: {timeline}" if timeline else ""
             # Include both display number and actual ID for GPT
-            summary += f"{i}. {priority_indicator} {task['title']}{timeline_str} [ID: {task['id']}]\n"
+            parts.append(f"{i}. {priority_indicator} {t_get('title')}{timeline_str} [ID: {t_get('id')}]")
         
         if completed_tasks:
-            summary += f"\nCompleted Tasks ({len(completed_tasks)}):\n"
+            parts.append(f"\nCompleted Tasks ({len(completed_tasks)}):")
             for i, task in enumerate(completed_tasks[-3:], 1):  # Show last 3 completed
-                summary += f"{i}. ✅ {task['title']} [ID: {task['id']}]\n"
+                parts.append(f"{i}. ✅ {task['title']} [ID: {task['id']}]")
         
-        return summary
+        return "\n".join(parts) + "\n"
         
     def get_function_definitions(self) -> List[Dict[str, Any]]:
         """Define functions that GPT can call for task management"""
-        return [
-            {
-                "name": "add_task",
-                "description": "Add a new task to the user's task list",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "title": {
-                            "type": "string",
-                            "description": "The main title/name of the task"
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "Detailed description of what needs to be done"
-                        },
-                        "timeline": {
-                            "type": "string",
-                            "description": "When this should be done (e.g., 'today', 'next week', '2024-01-15')"
-                        },
-                        "priority": {
-                            "type": "string",
-                            "enum": ["low", "medium", "high"],
-                            "description": "Priority level of the task"
-                        },
-                        "notes": {
-                            "type": "string",
-                            "description": "Additional notes or context about the task"
-                        }
-                    },
-                    "required": ["title"]
-                }
-            },
-            {
-                "name": "get_tasks",
-                "description": "Get the current list of tasks",
-                "parameters": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
-            },
-            {
-                "name": "complete_task",
-                "description": "Mark a task as completed. Can accept task ID, task title (partial match), or task number from the list.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "task_identifier": {
-                            "type": "string",
-                            "description": "The task to complete. Can be: UUID, partial title match, or number from active task list (e.g., '1', '2')"
-                        }
-                    },
-                    "required": ["task_identifier"]
-                }
-            }
-        ]
+        return _FUNCTION_DEFS
     
     def execute_function_call(self, function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a function call from GPT"""
         try:
-            if function_name == "add_task":
-                task = self.add_task_to_json(
-                    title=arguments.get("title", ""),
-                    description=arguments.get("description", ""),
-                    timeline=arguments.get("timeline", ""),
-                    priority=arguments.get("priority", "medium"),
-                    notes=arguments.get("notes", "")
-                )
-                return {"success": True, "task": task, "message": f"Task '{task['title']}' added successfully"}
-            
-            elif function_name == "get_tasks":
-                tasks = self.load_tasks()
-                return {"success": True, "tasks": tasks, "summary": self.get_tasks_summary()}
-            
-            elif function_name == "complete_task":
-                task_identifier = arguments.get("task_identifier", arguments.get("task_id", ""))
-                if self.complete_task_in_json(task_identifier):
-                    # Find the completed task for better feedback
-                    tasks = self.load_tasks()
-                    completed_task = None
-                    for task in tasks:
-                        if (task["id"] == task_identifier or 
-                            task_identifier.lower() in task["title"].lower() or
-                            task["completed"] and task["completed_at"]):
-                            completed_task = task
-                            break
-                    
-                    if completed_task:
-                        return {"success": True, "message": f"Task '{completed_task['title']}' marked as completed"}
-                    else:
-                        return {"success": True, "message": f"Task completed successfully"}
-                else:
-                    return {"success": False, "message": f"Could not find active task matching '{task_identifier}'. Check task ID, title, or number."}
-            
-            else:
+            handler = self._fn_table.get(function_name)
+            if handler is None:
                 return {"success": False, "message": f"Unknown function: {function_name}"}
+            return handler(arguments)
                 
         except Exception as e:
             return {"success": False, "message": f"Error executing {function_name}: {str(e)}"}
+    
+    def _fn_add_task(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the add_task function call"""
+        task = self.add_task_to_json(
+            title=arguments.get("title", ""),
+            description=arguments.get("description", ""),
+            timeline=arguments.get("timeline", ""),
+            priority=arguments.get("priority", "medium"),
+            notes=arguments.get("notes", "")
+        )
+        return {"success": True, "task": task, "message": f"Task '{task['title']}' added successfully"}
+    
+    def _fn_get_tasks(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the get_tasks function call"""
+        tasks = self.load_tasks()
+        return {"success": True, "tasks": tasks, "summary": self.get_tasks_summary()}
+    
+    def _fn_complete_task(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle the complete_task function call"""
+        task_identifier = arguments.get("task_identifier", "")
+        completed_task = self.complete_task_in_json(task_identifier)
+        if completed_task:
+            return {"success": True, "message": f"Task '{completed_task['title']}' marked as completed"}
+        else:
+            return {"success": False, "message": f"Could not find active task matching '{task_identifier}'. Check task ID, title, or number."}
         
     def load_api_key(self):
-        """Load API key from api_key.txt"""
+        """Load API key from api_key.txt and create the reusable OpenAI client"""
+        self.client = None
         try:
             with open('../api_key.txt', 'r') as f:
                 self.api_key = f.read().strip()
                 openai.api_key = self.api_key
+                # One client for the whole session keeps its connection pool alive
+                self.client = openai.AsyncOpenAI(
+                    api_key=self.api_key,
+                    # The SDK retries 429/5xx with jittered exponential backoff
+                    # and honors Retry-After before anything reaches the UI
+                    max_retries=5,
+                    # HTTP/2 lets the tool call and its follow-up share one
+                    # multiplexed connection
+                    http_client=httpx.AsyncClient(
+                        http2=HTTP2_AVAILABLE,
+                        limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+                        timeout=httpx.Timeout(30.0, connect=5.0)
+                    )
+                )
                 self.add_to_chat("NOX: API key loaded successfully!")
         except FileNotFoundError:
             self.add_to_chat("NOX: Please create api_key.txt with your OpenAI API key")
@@ -248,7 +891,8 @@ class NOXPopup:
             'primary_active': '#1669c9',# A slightly darker blue for when a button is pressed
             'text_primary': '#202124', # Dark gray for primary text (more readable than black)
             'text_secondary': '#5f6368',# Lighter gray for secondary info like the cost label
-            'border': '#dfe1e5'        # A subtle border for the input field
+            'border': '#dfe1e5',       # A subtle border for the input field
+            'error': '#d93025'         # Red for the error badge
         }
 
         self.fonts = {
@@ -290,15 +934,35 @@ class NOXPopup:
         )
         title_label.pack(side=tk.LEFT)
 
+        # Non-blocking error badge; shown instead of modal dialogs so the event loop keeps running
+        self.status_indicator = tk.Label(
+            header_frame,
+            text="",
+            bg=self.colors['bg'],
+            fg=self.colors['error'],
+            font=self.fonts['title']
+        )
+        self.status_indicator.pack(side=tk.LEFT, padx=(8, 0))
+
+        self.cost_var = tk.StringVar(value="Cost: $0.00")
         self.cost_label = tk.Label(
             header_frame,
-            text="Cost: $0.00",
+            textvariable=self.cost_var,
             bg=self.colors['bg'],
             fg=self.colors['text_secondary'],
             font=self.fonts['label']
         )
         self.cost_label.pack(side=tk.RIGHT, pady=(5,0)) # Align better with title
 
+        self.cache_stats_label = tk.Label(
+            header_frame,
+            text="",
+            bg=self.colors['bg'],
+            fg=self.colors['text_secondary'],
+            font=self.fonts['label']
+        )
+        self.cache_stats_label.pack(side=tk.RIGHT, padx=(0, 10), pady=(5,0))
+
         # --- Chat History ---
         # Frame to hold the chat history and give it a border
         chat_frame = tk.Frame(
@@ -311,6 +975,7 @@ class NOXPopup:
         self.chat_history = scrolledtext.ScrolledText(
             chat_frame,
             wrap=tk.WORD,
+            height=1, # Grows to fill; a small request leaves room for the rows below
             bg=self.colors['surface'],
             fg=self.colors['text_primary'],
             font=self.fonts['body'],
@@ -349,6 +1014,22 @@ class NOXPopup:
         button_frame = tk.Frame(main_frame, bg=self.colors['bg'])
         button_frame.pack(fill=tk.X, pady=(10, 0))
 
+        # Packed first so it always gets its full width
+        self.send_button = tk.Button(
+            button_frame,
+            text="Send",
+            command=self.send_message,
+            bg=self.colors['primary'],
+            fg=self.colors['surface'],
+            font=self.fonts['button'],
+            relief=tk.FLAT,
+            padx=25,
+            pady=5,
+            activebackground=self.colors['primary_active'],
+            activeforeground=self.colors['surface']
+        )
+        self.send_button.pack(side=tk.RIGHT)
+
         # Move close button to be less prominent
         close_button = tk.Button(
             button_frame,
@@ -362,20 +1043,82 @@ class NOXPopup:
         )
         close_button.pack(side=tk.LEFT)
 
-        self.send_button = tk.Button(
+        clear_cache_button = tk.Button(
             button_frame,
-            text="Send",
-            command=self.send_message,
-            bg=self.colors['primary'],
-            fg=self.colors['surface'],
-            font=self.fonts['button'],
+            text="Clear cache",
+            command=self.clear_response_cache,
+            bg=self.colors['bg'],
+            fg=self.colors['text_secondary'],
+            font=self.fonts['label'],
             relief=tk.FLAT,
-            padx=25,
-            pady=5,
-            activebackground=self.colors['primary_active'],
-            activeforeground=self.colors['surface']
+            activeforeground=self.colors['text_primary']
         )
-        self.send_button.pack(side=tk.RIGHT)
+        clear_cache_button.pack(side=tk.LEFT)
+
+        # --- Options Frame ---
+        # Toggles get their own row; the 410px button row can't hold them too
+        options_frame = tk.Frame(main_frame, bg=self.colors['bg'])
+        options_frame.pack(fill=tk.X, pady=(5, 0))
+
+        # Replies are sampled (temperature > 0), so reusing them is opt-in
+        self.cache_sampled_replies = False
+        self.cache_replies_var = tk.BooleanVar(value=False)
+        cache_checkbox = tk.Checkbutton(
+            options_frame,
+            text="Reuse replies",
+            variable=self.cache_replies_var,
+            command=self.toggle_reply_cache,
+            bg=self.colors['bg'],
+            fg=self.colors['text_secondary'],
+            font=self.fonts['label'],
+            activebackground=self.colors['bg'],
+            highlightthickness=0
+        )
+        cache_checkbox.pack(side=tk.LEFT)
+
+        # Non-urgent asks can go through the Batch API at half price
+        self.batch_mode = False
+        self.batch_mode_var = tk.BooleanVar(value=False)
+        batch_checkbox = tk.Checkbutton(
+            options_frame,
+            text="Queue for batch",
+            variable=self.batch_mode_var,
+            command=self.toggle_batch_mode,
+            bg=self.colors['bg'],
+            fg=self.colors['text_secondary'],
+            font=self.fonts['label'],
+            activebackground=self.colors['bg'],
+            highlightthickness=0
+        )
+        batch_checkbox.pack(side=tk.LEFT)
+
+        # Reply length cap; 0 leaves it to reply_token_cap's heuristic
+        self.max_tokens_override = 0
+        max_tokens_scale = tk.Scale(
+            options_frame,
+            from_=0,
+            to=500,
+            resolution=50,
+            orient=tk.HORIZONTAL,
+            length=90,
+            showvalue=True,
+            command=self.set_max_tokens_override,
+            bg=self.colors['bg'],
+            fg=self.colors['text_secondary'],
+            font=self.fonts['label'],
+            highlightthickness=0,
+            bd=0
+        )
+        max_tokens_scale.pack(side=tk.RIGHT)
+
+        max_tokens_label = tk.Label(
+            options_frame,
+            text="Max tokens",
+            bg=self.colors['bg'],
+            fg=self.colors['text_secondary'],
+            font=self.fonts['label']
+        )
+        max_tokens_label.pack(side=tk.RIGHT)
 
     def handle_enter(self, event):
         """Handle Enter key - send message unless Ctrl+Enter."""
@@ -409,156 +1152,638 @@ class NOXPopup:
         message = self.chat_input.get(1.0, tk.END).strip()
         if not message:
             return
+        
+        # Trivial commands never need a network round-trip
+        handler = self._local_commands.get(message.lower().rstrip("?!. "))
+        if handler is not None:
+            self.chat_input.delete(1.0, tk.END)
+            self.add_to_chat(f"You: {message}")
+            reply = handler()
+            if reply:
+                self.add_to_chat(f"NOX: {reply}")
+            return
             
-        if not self.api_key:
+        if not self.api_key and not REPLAY_MODE:
             self.add_to_chat("NOX: Please add your API key to api_key.txt")
             return
             
         self.add_to_chat(f"You: {message}")
         self.chat_input.delete(1.0, tk.END)
         
+        if self.batch_mode:
+            self._queue_batch_request(message)
+            return
+        
+        # Messages sent in quick succession go out together as one request
+        self._pending.append(message)
+        if self._request_in_flight:
+            self._update_send_button()
+            return
+        if len(self._pending) >= self.MAX_BATCH_MESSAGES:
+            # A full batch gains nothing from waiting out the window
+            if self._pending_after_id is not None:
+                self.root.after_cancel(self._pending_after_id)
+            self._flush_pending()
+        elif self._pending_after_id is None:
+            self._pending_after_id = self.root.after(200, self._flush_pending)
+        
+    def _cmd_help(self) -> str:
+        """Local command: usage help"""
+        return HELP_TEXT
+        
+    def _cmd_tasks(self) -> str:
+        """Local command: current task summary"""
+        return self.get_tasks_summary().rstrip()
+        
+    def _cmd_cost(self) -> str:
+        """Local command: session cost"""
+        return f"This session has cost ${self.total_ucents / 1e8:.6f} so far."
+        
+    def _cmd_clear(self) -> None:
+        """Local command: clear the chat history"""
+        self._chat_queue.clear()
+        self.chat_history.delete(1.0, tk.END)
+        
+    def _cmd_batch(self) -> str:
+        """Local command: submit queued batch requests"""
+        if not os.path.exists(self.batch_file):
+            return "No requests are queued for batch processing."
+        if not self.api_key:
+            return "Please add your API key to api_key.txt"
+        
+        # Move the queue aside so new requests start a fresh file
+        submitted_file = f"{self.batch_file}.{uuid.uuid4().hex[:8]}.submitted"
+        try:
+            os.replace(self.batch_file, submitted_file)
+        except OSError as e:
+            return f"Error - could not submit the batch queue: {e}"
+        asyncio.run_coroutine_threadsafe(self._submit_batch(submitted_file), self.loop)
+        return "Submitting queued requests to the Batch API. Results will appear here when it finishes (up to 24h)."
+        
+    def _queue_batch_request(self, message: str):
+        """Append a chat completion request for the message to the batch file"""
+        # No tools: nothing is around to execute calls when results come back
+        body = {
+            "model": "gpt-4o-mini",
+            "messages": [
+                self._system_msg,
+                {"role": "system", "content": f"Current tasks:\n{self.get_tasks_summary()}"},
+                {"role": "user", "content": message}
+            ],
+            "max_tokens": self.reply_token_cap(message),
+            "temperature": 0.7
+        }
+        
+        # An earlier batch may already have answered this exact request
+        entry = self._llm_cache.get(LLMCache.make_key(body), body["max_tokens"])
+        if entry is not None:
+            self.add_to_chat(f"NOX (batch, cached): {entry['content']}")
+            self.update_cache_stats()
+            return
+        
+        request = {
+            "custom_id": str(uuid.uuid4()),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": body
+        }
+        try:
+            with open(self.batch_file, 'a', encoding='utf-8') as f:
+                f.write(json_dumps(request) + "\n")
+        except OSError as e:
+            self.add_to_chat(f"NOX: Error - could not queue request: {e}")
+            return
+        self.add_to_chat("NOX: Queued for batch processing. Type \"batch\" to submit the queue.")
+        
+    def _resume_batches(self):
+        """Resume polling batches submitted by earlier sessions"""
+        prefix = self.batch_file + "."
+        try:
+            names = os.listdir(".")
+        except OSError as e:
+            print(f"Error looking for pending batches: {e}")
+            return
+        for name in names:
+            if name.startswith(prefix) and name.endswith(".pending"):
+                asyncio.run_coroutine_threadsafe(self._collect_batch(name), self.loop)
+        
+    async def _submit_batch(self, submitted_file: str):
+        """Upload a batch file, record the batch on disk, and wait for its results"""
+        batch = None
+        try:
+            requests = {}
+            with open(submitted_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    request = json_loads(line)
+                    requests[request["custom_id"]] = request["body"]
+            
+            with open(submitted_file, 'rb') as f:
+                uploaded = await self.client.files.create(file=f, purpose="batch")
+            batch = await self.client.batches.create(
+                input_file_id=uploaded.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            
+            # The record outlives this session; _resume_batches picks it up on restart
+            record_file = f"{self.batch_file}.{batch.id}.pending"
+            tmp_file = record_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(json_dumps({"id": batch.id, "requests": requests}))
+            os.replace(tmp_file, record_file)
+            os.remove(submitted_file)
+        except Exception as e:
+            if batch is None:
+                # Nothing was submitted: put the requests back so "batch" can retry them
+                self._restore_batch_queue(submitted_file)
+                e = f"{e} (requests are still queued)"
+            self.root.after(0, self.add_to_chat, f"NOX: Batch error - {e}")
+            self.root.after(0, lambda: self.status_indicator.config(text="!"))
+            return
+        
+        await self._collect_batch(record_file)
+        
+    def _restore_batch_queue(self, submitted_file: str):
+        """Append the requests of an unsubmitted batch back onto the queue file"""
+        try:
+            with open(submitted_file, 'r', encoding='utf-8') as f:
+                requests = f.read()
+            with open(self.batch_file, 'a', encoding='utf-8') as f:
+                f.write(requests)
+            os.remove(submitted_file)
+        except OSError as e:
+            print(f"Error restoring batch queue from {submitted_file}: {e}")
+        
+    async def _collect_batch(self, record_file: str):
+        """Poll a recorded batch until it finishes, then post and cache the results.
+        The record is only removed once the results have been handled."""
+        try:
+            with open(record_file, 'r', encoding='utf-8') as f:
+                record = json_loads(f.read())
+            requests = record["requests"]
+            
+            batch = await self.client.batches.retrieve(record["id"])
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                await asyncio.sleep(60)
+                batch = await self.client.batches.retrieve(batch.id)
+            
+            if batch.status != "completed" or not batch.output_file_id:
+                self.root.after(0, self.add_to_chat, f"NOX: Batch {batch.id} ended with status '{batch.status}'.")
+                os.remove(record_file)
+                return
+            
+            output = await self.client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                result = json_loads(line)
+                body = requests.get(result["custom_id"])
+                question = body["messages"][-1]["content"] if body else ""
+                response = result.get("response") or {}
+                if response.get("status_code") != 200:
+                    self.root.after(0, self.add_to_chat, f"NOX (batch): Error answering \"{question}\": {result.get('error')}")
+                    continue
+                
+                reply_body = response["body"]
+                usage = reply_body["usage"]
+                choice = reply_body["choices"][0]
+                reply = choice["message"]["content"] or ""
+                # Batch API pricing is half the synchronous rate
+                self.total_ucents += (usage["prompt_tokens"] * self.INPUT_UCENTS_PER_TOKEN
+                                      + usage["completion_tokens"] * self.OUTPUT_UCENTS_PER_TOKEN) // 2
+                if body is not None:
+                    self._llm_cache.put(LLMCache.make_key(body), {
+                        "content": reply,
+                        "tool_calls": [],
+                        "prompt_tokens": usage["prompt_tokens"],
+                        "completion_tokens": usage["completion_tokens"],
+                        "max_tokens": body["max_tokens"],
+                        "finish_reason": choice.get("finish_reason")
+                    })
+                self.root.after(0, self.add_to_chat, f"NOX (batch): \"{question}\"\n{reply}")
+            
+            os.remove(record_file)
+            self.root.after(0, self._refresh_cost_label)
+        except Exception as e:
+            # The record stays on disk, so the next launch tries again
+            self.root.after(0, self.add_to_chat, f"NOX: Batch error - {e}")
+            self.root.after(0, lambda: self.status_indicator.config(text="!"))
+        
+    def _flush_pending(self):
+        """Send the messages queued during the coalescing window as one request"""
+        self._pending_after_id = None
+        if self._request_in_flight or not self._pending:
+            return
+        messages = self._pending[:self.MAX_BATCH_MESSAGES]
+        del self._pending[:self.MAX_BATCH_MESSAGES]  # The rest go once this request finishes
+        
+        if len(messages) == 1:
+            prompt = messages[0]
+        else:
+            numbered = "\n".join(f"{i}) {m}" for i, m in enumerate(messages, 1))
+            prompt = f"Please answer each of these messages in order, numbering your answers to match:\n{numbered}"
+        
+        self._request_in_flight = True
+        
         # Show loading message
-        self.add_to_chat("NOX: Thinking...")
+        self._show_thinking_message()
+        self._stream_started = False
         
         # Disable send button during processing
-        self.send_button.config(state=tk.DISABLED, text="Thinking...")
+        self.send_button.config(state=tk.DISABLED)
+        self._update_send_button()
+        
+        # Send to GPT on the background event loop
+        asyncio.run_coroutine_threadsafe(self.get_gpt_response(prompt), self.loop)
+        
+    def _update_send_button(self):
+        """Show the in-flight state and how many messages are waiting behind it"""
+        if self._pending:
+            self.send_button.config(text=f"Thinking... (+{len(self._pending)})")
+        else:
+            self.send_button.config(text="Thinking...")
         
-        # Send to GPT in separate thread
-        threading.Thread(target=self.get_gpt_response, args=(message,), daemon=True).start()
+    def _finish_request(self):
+        """Re-enable input and send anything queued while the request ran"""
+        self._request_in_flight = False
+        self.send_button.config(state=tk.NORMAL, text="Send")
+        if self._pending and self._pending_after_id is None:
+            self._pending_after_id = self.root.after(200, self._flush_pending)
+        
+    def set_max_tokens_override(self, value):
+        """Mirror the slider into a plain attribute the worker thread can read"""
+        self.max_tokens_override = int(float(value))
+        
+    def reply_token_cap(self, message: str) -> int:
+        """Output token budget: the slider value if set, else scaled to the question"""
+        if self.max_tokens_override:
+            return self.max_tokens_override
+        return min(500, max(150, 8 * len(message.split())))
+        
+    def _token_encoding(self):
+        """The tiktoken encoding for cost estimates, or None; loaded on first use
+        since it may download its BPE file"""
+        if not self._enc_loaded:
+            self._enc_loaded = True
+            if tiktoken is not None:
+                try:
+                    self._enc = tiktoken.encoding_for_model("gpt-4o-mini")
+                except Exception as e:
+                    print(f"Token counting unavailable: {e}")
+        return self._enc
         
-    def get_gpt_response(self, message):
+    async def get_gpt_response(self, message):
         """Get response from GPT-4o Mini with function calling support"""
         try:
-            client = openai.OpenAI(api_key=self.api_key)
-            
             # Get current tasks for context
             current_tasks = self.get_tasks_summary()
+            max_tokens = self.reply_token_cap(message)
+            turn_key = TurnRecorder.make_key(NOX_SYSTEM_PREAMBLE, current_tasks, message, "gpt-4o-mini", 0.7, max_tokens)
             
-            system_prompt = f"""You are NOX, a helpful personal assistant. You can manage tasks for the user.
-
-Current tasks:
-{current_tasks}
-
-You have access to task management functions. Use them when:
-- User asks to add a task or mentions something they need to do
-- User asks about their current tasks
-- User wants to mark something as complete
-- User asks you to break down a complex task into smaller ones
-
-Keep responses concise and helpful. When you use functions, explain what you did."""
+            if REPLAY_MODE:
+                # Replay the recorded turn as-is: no API calls and no tool side effects
+                turn = self._turn_recorder.get(turn_key)
+                if turn is None:
+                    raise RuntimeError("No recorded turn for this message and task list (record one by running with NOX_RECORD=1)")
+                for function_name, result in turn["function_results"]:
+                    self.root.after(0, self._show_function_result, function_name, result)
+                self.root.after(0, self.handle_gpt_response, turn["reply"])
+                return
+            
+            # Near-duplicate prompts against the same task list reuse an earlier
+            # reply; opt-in like the exact cache since replies are sampled
+            query_embedding = None
+            if self.cache_sampled_replies:
+                cache_context = hashlib.sha256(current_tasks.encode("utf-8")).hexdigest()
+                try:
+                    embedding_response = await self.client.embeddings.create(model="text-embedding-3-small", input=message)
+                except Exception as e:  # Only a cache lookup; answer without it
+                    print(f"Error embedding message for semantic cache: {e}")
+                else:
+                    query_embedding = embedding_response.data[0].embedding
+                    self.total_ucents += embedding_response.usage.prompt_tokens * self.EMBEDDING_UCENTS_PER_TOKEN
+                    cached_reply = self._semantic_cache.lookup(query_embedding, cache_context)
+                    if cached_reply is not None:
+                        self.root.after(0, self.handle_gpt_response, cached_reply)
+                        return
+            
+            # Static preamble first so the provider can cache the shared prefix;
+            # only the tasks block changes between turns
+            prompt_messages = [
+                self._system_msg,
+                {"role": "system", "content": f"Current tasks:\n{current_tasks}"}
+            ]
+            
+            enc = self._token_encoding()
+            if enc is not None:
+                # Show the prompt cost now; the reported usage replaces it when the reply is done
+                try:
+                    prompt_tokens = sum(
+                        len(enc.encode(text, disallowed_special=())) + 3
+                        for text in [m["content"] for m in prompt_messages] + [message]
+                    )
+                except Exception as e:  # Only an estimate; never fail the turn over it
+                    print(f"Error estimating prompt cost: {e}")
+                else:
+                    self.root.after(0, self._show_cost_estimate, prompt_tokens * self.INPUT_UCENTS_PER_TOKEN)
 
-            response = client.chat.completions.create(
+            request = dict(
                 model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": message}
-                ],
-                tools=[{"type": "function", "function": func} for func in self.get_function_definitions()],
+                messages=prompt_messages + [{"role": "user", "content": message}],
+                tools=self._tools,
                 tool_choice="auto",
-                max_tokens=500,
+                max_tokens=max_tokens,
+                stop=["\nUser:", "\nYou:"],
                 temperature=0.7
             )
+            response_text, tool_calls, usage, finish_reason = await self._stream_completion(**request)
+            extra_input_tokens = extra_output_tokens = 0
+            
+            # Short asks can still fan out into several tool calls ("break this
+            # down"); if the cap cut them off, retry once with the full budget.
+            # Only when nothing was streamed, so no text is shown twice.
+            if tool_calls and finish_reason == "length" and not response_text and max_tokens < 500:
+                extra_input_tokens, extra_output_tokens = usage.prompt_tokens, usage.completion_tokens
+                request["max_tokens"] = 500
+                response_text, tool_calls, usage, finish_reason = await self._stream_completion(**request)
+            if tool_calls and finish_reason == "length":
+                # A truncated call has broken arguments; running only the complete ones
+                # would apply part of the request
+                self.total_ucents += ((usage.prompt_tokens + extra_input_tokens) * self.INPUT_UCENTS_PER_TOKEN
+                                      + (usage.completion_tokens + extra_output_tokens) * self.OUTPUT_UCENTS_PER_TOKEN)
+                raise RuntimeError("The reply hit its token limit while requesting task changes, so none were made. "
+                                   "Raise the max tokens slider or split the request.")
             
             # Handle tool calls (modern API)
-            response_message = response.choices[0].message
             function_results = []
-            
-            if response_message.tool_calls:
-                # Execute the function call
-                tool_call = response_message.tool_calls[0]  # Handle first tool call
-                function_name = tool_call.function.name
-                
-                try:
-                    function_args = json.loads(tool_call.function.arguments)
-                except json.JSONDecodeError as e:
-                    self.root.after(0, lambda: self.handle_gpt_error(f"Invalid function arguments: {e}"))
-                    return
-                
-                result = self.execute_function_call(function_name, function_args)
-                function_results.append(result)
-                
-                # Get a follow-up response that incorporates the function result
-                messages = [
-                    {"role": "system", "content": system_prompt},
+            if tool_calls:
+                # Execute every requested call so a multi-tool turn ("add these 3
+                # tasks") needs a single follow-up round-trip
+                messages = prompt_messages + [
                     {"role": "user", "content": message},
-                    {"role": "assistant", "content": response_message.content, "tool_calls": response_message.tool_calls},
-                    {"role": "tool", "tool_call_id": tool_call.id, "content": json.dumps(result)}
+                    {"role": "assistant", "content": response_text or None, "tool_calls": tool_calls}
                 ]
+                for tool_call in tool_calls:
+                    function_name = tool_call["function"]["name"]
+                    
+                    validate = _ARG_VALIDATORS.get(function_name, json_loads)
+                    try:
+                        function_args = validate(tool_call["function"]["arguments"] or "{}")
+                    except ValueError as e:  # Includes JSONDecodeError
+                        result = {"success": False, "message": f"Invalid function arguments: {e}"}
+                    else:
+                        result = self.execute_function_call(function_name, function_args)
+                    # Show the outcome now rather than after the follow-up reply
+                    self.root.after(0, self._show_function_result, function_name, result)
+                    function_results.append((function_name, result))
+                    
+                    # Every tool call needs a matching tool message in the follow-up
+                    messages.append({"role": "tool", "tool_call_id": tool_call["id"], "content": json_dumps(result)})
                 
-                follow_up = client.chat.completions.create(
+                final_reply, _, follow_up_usage, _ = await self._stream_completion(
                     model="gpt-4o-mini",
                     messages=messages,
-                    max_tokens=300,
+                    max_tokens=200,
+                    stop=["\nUser:", "\nYou:"],
                     temperature=0.7
                 )
                 
-                final_reply = follow_up.choices[0].message.content
-                
                 # Calculate total cost for both calls
-                total_input_tokens = response.usage.prompt_tokens + follow_up.usage.prompt_tokens
-                total_output_tokens = response.usage.completion_tokens + follow_up.usage.completion_tokens
+                total_input_tokens = usage.prompt_tokens + follow_up_usage.prompt_tokens + extra_input_tokens
+                total_output_tokens = usage.completion_tokens + follow_up_usage.completion_tokens + extra_output_tokens
                 
             else:
-                final_reply = response_message.content
-                total_input_tokens = response.usage.prompt_tokens
-                total_output_tokens = response.usage.completion_tokens
+                final_reply = response_text
+                total_input_tokens = usage.prompt_tokens + extra_input_tokens
+                total_output_tokens = usage.completion_tokens + extra_output_tokens
+            
+            self.total_ucents += (total_input_tokens * self.INPUT_UCENTS_PER_TOKEN
+                                  + total_output_tokens * self.OUTPUT_UCENTS_PER_TOKEN)
             
-            # Calculate cost (GPT-4o-mini pricing: $0.15 per 1M input tokens, $0.6 per 1M output tokens)
-            input_cost = total_input_tokens * 0.00000015
-            output_cost = total_output_tokens * 0.0000006
-            total_cost = input_cost + output_cost
+            # Only plain answers are reusable; tool calls have side effects
+            if query_embedding is not None and not tool_calls and final_reply:
+                self._semantic_cache.add(query_embedding, cache_context, final_reply)
             
-            self.total_cost += total_cost
+            if RECORD_MODE:
+                self._turn_recorder.put(turn_key, {
+                    "reply": final_reply,
+                    "function_results": function_results,
+                    "prompt_tokens": total_input_tokens,
+                    "completion_tokens": total_output_tokens
+                })
             
             # Update UI in main thread
-            self.root.after(0, lambda: self.handle_gpt_response(final_reply, function_results))
+            self.root.after(0, self.handle_gpt_response, final_reply)
             
         except Exception as e:
             self.root.after(0, self.handle_gpt_error, str(e))
             
-    def handle_gpt_response(self, reply, function_results=None):
+    async def _stream_completion(self, **request):
+        """Run a streamed chat completion, forwarding text to the chat as it arrives.
+        Returns (full text, assembled tool calls, usage, finish reason)."""
+        cache_key = None
+        if request.get("temperature") == 0 or self.cache_sampled_replies:
+            cache_key = LLMCache.make_key(request)
+            entry = self._llm_cache.get(cache_key, request["max_tokens"])
+            if entry is not None:
+                if entry["content"]:
+                    self.root.after(0, self._append_stream, entry["content"])
+                return entry["content"], entry["tool_calls"], _CACHED_USAGE, entry["finish_reason"]
+        
+        # Rough estimate (~4 chars per token) plus the completion budget, as the API counts it
+        prompt_chars = sum(len(m.get("content") or "") for m in request["messages"])
+        await self._limiter.acquire(prompt_chars // 4 + request["max_tokens"])
+        stream = await self.client.chat.completions.create(
+            stream=True,
+            stream_options={"include_usage": True},
+            **request
+        )
+        
+        text_parts = []
+        unsent_from = 0  # text_parts[unsent_from:] haven't been handed to the UI yet
+        last_post = float("-inf")  # The first text goes out as soon as it arrives
+        tool_calls: Dict[int, Dict[str, Any]] = {}
+        usage = None
+        finish_reason = None
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage  # Arrives in the final, choice-less chunk
+            if not chunk.choices:
+                continue
+            
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta
+            if delta.content:
+                text_parts.append(delta.content)
+                # Hand text to the UI thread every 50ms rather than once per token
+                now = time.monotonic()
+                if now - last_post >= 0.05:
+                    self.root.after(0, self._append_stream, "".join(text_parts[unsent_from:]))
+                    unsent_from = len(text_parts)
+                    last_post = now
+            
+            # Tool call names/arguments arrive as fragments keyed by index
+            for call_delta in delta.tool_calls or []:
+                call = tool_calls.setdefault(call_delta.index, {
+                    "id": "",
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                })
+                if call_delta.id:
+                    call["id"] = call_delta.id
+                if call_delta.function:
+                    if call_delta.function.name:
+                        call["function"]["name"] += call_delta.function.name
+                    if call_delta.function.arguments:
+                        call["function"]["arguments"] += call_delta.function.arguments
+        
+        if unsent_from < len(text_parts):
+            self.root.after(0, self._append_stream, "".join(text_parts[unsent_from:]))
+        text = "".join(text_parts)
+        calls = [tool_calls[i] for i in sorted(tool_calls)]
+        if cache_key is not None and usage is not None:
+            self._llm_cache.put(cache_key, {
+                "content": text,
+                "tool_calls": calls,
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "max_tokens": request["max_tokens"],
+                "finish_reason": finish_reason
+            })
+        return text, calls, usage, finish_reason
+    
+    def toggle_batch_mode(self):
+        """Mirror the batch checkbox into a plain attribute"""
+        self.batch_mode = self.batch_mode_var.get()
+        
+    def toggle_reply_cache(self):
+        """Mirror the checkbox into a plain attribute the worker thread can read"""
+        self.cache_sampled_replies = self.cache_replies_var.get()
+        
+    def _refresh_cost_label(self):
+        """Update the cost label if the total changed"""
+        if self.total_ucents != self._shown_ucents:
+            self._shown_ucents = self.total_ucents
+            self.cost_var.set(f"Cost: ${self.total_ucents / 1e8:.6f}")
+        
+    def _show_cost_estimate(self, pending_ucents: int):
+        """Show the running cost plus a locally estimated cost for the pending request"""
+        self._shown_ucents = None  # Force the next refresh to show the reported figure
+        self.cost_var.set(f"Cost: ${(self.total_ucents + pending_ucents) / 1e8:.6f} (est.)")
+        
+    def update_cache_stats(self):
+        """Show response cache hits/misses in the header"""
+        cache = self._llm_cache
+        if cache.hits or cache.misses:
+            self.cache_stats_label.config(text=f"Cache: {cache.hits} hit / {cache.misses} miss")
+        else:
+            self.cache_stats_label.config(text="")
+        
+    def clear_response_cache(self):
+        """Delete all cached replies"""
+        self._llm_cache.clear()
+        self._semantic_cache.clear()
+        self._turn_recorder.clear()
+        self.update_cache_stats()
+        self.add_to_chat("NOX: Response cache cleared.")
+    
+    def _append_stream(self, text):
+        """Append streamed reply text in main thread"""
+        if not self._stream_started:
+            self._stream_started = True
+            self._remove_thinking_message()
+            self._queue_chat("NOX: ")
+        self._queue_chat(text)
+        
+    def _end_stream(self):
+        """Terminate a streamed reply so following messages start on a new block"""
+        if self._stream_started:
+            self._stream_started = False
+            self._queue_chat("\n\n")
+        
+    def _show_thinking_message(self):
+        """Insert the "Thinking..." placeholder between marks so it can be removed in place"""
+        self._flush_chat()  # Keep it after anything still queued
+        self.chat_history.mark_set("loading_start", "end-1c")
+        self.chat_history.mark_gravity("loading_start", tk.LEFT)
+        self.chat_history.insert(tk.END, "NOX: Thinking...\n\n")
+        # Left gravity on both so later inserts at END don't drag the marks along
+        self.chat_history.mark_set("loading_end", "end-1c")
+        self.chat_history.mark_gravity("loading_end", tk.LEFT)
+        self.chat_history.see(tk.END)
+        self._thinking_shown = True
+        
+    def _remove_thinking_message(self):
+        """Remove the "Thinking..." message"""
+        if self._thinking_shown:
+            self._thinking_shown = False
+            self.chat_history.delete("loading_start", "loading_end")
+        
+    def _show_function_result(self, function_name, result):
+        """Report an executed function call in main thread, between the two replies"""
+        self._end_stream()
+        self._remove_thinking_message()
+        if result.get("success"):
+            self.add_to_chat(f"[Executed {function_name}] {result.get('message', 'Done')}")
+        else:
+            self.add_to_chat(f"[Failed {function_name}] {result.get('message', 'Unknown error')}")
+        
+    def handle_gpt_response(self, reply):
         """Handle GPT response in main thread"""
-        # Remove the "Thinking..." message
-        content = self.chat_history.get(1.0, tk.END)
-        if "NOX: Thinking..." in content:
-            lines = content.split('\n')
-            filtered_lines = [line for line in lines if line.strip() != "NOX: Thinking..."]
-            self.chat_history.delete(1.0, tk.END)
-            self.chat_history.insert(1.0, '\n'.join(filtered_lines))
-        
-        self.add_to_chat(f"NOX: {reply}")
-        
-        # If there were function calls, add debug info
-        if function_results:
-            for result in function_results:
-                if result.get("success"):
-                    self.add_to_chat(f"[DEBUG] Function executed successfully: {result.get('message', 'No message')}")
-                else:
-                    self.add_to_chat(f"[DEBUG] Function failed: {result.get('message', 'Unknown error')}")
+        if self._stream_started:
+            # The reply has already been rendered chunk by chunk
+            self._end_stream()
+        else:
+            self._remove_thinking_message()
+            self.add_to_chat(f"NOX: {reply}")
         
-        self.cost_label.config(text=f"Cost: ${self.total_cost:.6f}")
-        self.send_button.config(state=tk.NORMAL, text="Send")
+        self.status_indicator.config(text="")
+        self._refresh_cost_label()
+        self.update_cache_stats()
+        self._finish_request()
         
     def handle_gpt_error(self, error):
         """Handle GPT error in main thread"""
-        # Remove the "Thinking..." message
-        content = self.chat_history.get(1.0, tk.END)
-        if "NOX: Thinking..." in content:
-            lines = content.split('\n')
-            filtered_lines = [line for line in lines if line.strip() != "NOX: Thinking..."]
-            self.chat_history.delete(1.0, tk.END)
-            self.chat_history.insert(1.0, '\n'.join(filtered_lines))
+        self._end_stream()
+        self._remove_thinking_message()
         
         self.add_to_chat(f"NOX: Error - {error}")
-        self.send_button.config(state=tk.NORMAL, text="Send")
+        self.status_indicator.config(text="!")
+        self._refresh_cost_label()  # Drop any pending estimate
+        self._finish_request()
         
     def add_to_chat(self, message):
         """Add message to chat history"""
-        self.chat_history.insert(tk.END, message + "\n\n")
+        self._queue_chat(message + "\n\n")
+        
+    def _queue_chat(self, text):
+        """Queue text for the chat history, scheduling a flush for the next tick"""
+        self._chat_queue.append(text)
+        if not self._chat_flush_scheduled:
+            self._chat_flush_scheduled = True
+            self.root.after(self.CHAT_FLUSH_MS, self._flush_chat)
+        
+    def _flush_chat(self):
+        """Insert all queued chat text with one insert and one scroll"""
+        self._chat_flush_scheduled = False
+        if not self._chat_queue:
+            return
+        text = "".join(self._chat_queue)
+        self._chat_queue.clear()
+        self.chat_history.insert(tk.END, text)
+        lines = int(self.chat_history.index("end-1c").split(".")[0])
+        if lines > self.MAX_CHAT_LINES:
+            self.chat_history.delete("1.0", f"{lines - self.MAX_CHAT_LINES + 1}.0")
         self.chat_history.see(tk.END)
         
     def close_window(self):
         """Close the application"""
+        self._close_tasks_log()
+        if self.client is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self.client.close(), self.loop).result(timeout=1)
+            except Exception as e:
+                print(f"Error closing OpenAI client: {e}")
         self.root.destroy()
         
     def show(self):